@@ -4,56 +4,135 @@ Database-driven system with auth tokens and complete data persistence.
 """
 
 import asyncio
-import tempfile
+import hashlib
 import os
 import time
 import shutil
-import psutil
-from datetime import datetime
+import uuid
+import httpx
+import orjson
+from pathlib import Path
 from typing import Optional, Dict, Any, List
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.prompts import ChatPromptTemplate
 
 # Import our modules
-from src.bot.graph import app as graph_app, llm
-from src.bot.helper import get_personalized_greeting_prompt, get_greeting_message
+from src.bot.graph import app as graph_app, CHECKPOINT_DURABILITY
+from src.bot.helper import get_personalized_greeting_message
 from src.referal_letter.extraction import AsyncReferralLetterExtractor
 from app.database import db_manager
+from app.sessions import create_session_store
 from app.schemas import (
     ChatRequest, ChatResponse, ReferralLetterResponse,
     ConsultationSearchResponse, ConsultationDetailsResponse,
-    StatisticsResponse, HealthCheckResponse, ErrorResponse
+    HealthCheckResponse
 )
 
 # Initialize FastAPI app
-app = FastAPI(title="Sleep Consultation AI API", version="2.0.0")
+app = FastAPI(
+    title="Sleep Consultation AI API",
+    version="2.0.0",
+    default_response_class=ORJSONResponse
+)
 
-# Add CORS middleware
+# Add CORS middleware. Origins come from CORS_ORIGINS (comma-separated); without it any origin
+# is allowed but credentials are not (browsers reject wildcard origins with credentials anyway).
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS or ["*"],
+    allow_credentials=bool(CORS_ORIGINS),
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    expose_headers=["ETag"],
+    max_age=86400,
 )
 
-# Initialize referral letter extractor
-extractor = AsyncReferralLetterExtractor()
+# Compress large JSON responses (consultation transcripts, summaries)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Referral letter extractor, created at startup so its HTTP client is bound to the server's event loop
+extractor: Optional[AsyncReferralLetterExtractor] = None
 
 # Create directory for storing PDF files
 PDF_STORAGE_DIR = "stored_pdfs"
 os.makedirs(PDF_STORAGE_DIR, exist_ok=True)
 
-# In-memory session storage for active conversations
-sessions: Dict[str, Dict[str, Any]] = {}
+# Buffer size used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Storage for active conversations (in-process, or Redis when REDIS_URL is set).
+# Evicted sessions are restored from the database on the next message.
+session_store = create_session_store()
+
+# Auth token -> (referral, consultation) lookups for active tokens.
+# Invalidated when a consultation is created or completed.
+token_context_cache: TTLCache = TTLCache(maxsize=2048, ttl=300)
+
+# Bound the number of concurrent graph runs (each one holds a worker thread for the LLM latency)
+GRAPH_SEM = asyncio.Semaphore(int(os.getenv("GRAPH_CONCURRENCY", "16")))
+
+# Default values for a fresh conversation state
+INITIAL_STATE_TEMPLATE: Dict[str, Any] = {
+    "referral_letter": "",
+    "patient_name": None,
+    "off_topic_counter": 0,
+    "last_question": "",
+    "questions_answered": 0,
+    "summary_confirmed": False,
+    "terminate_reason": None,
+    "doctor_summary": None,
+    "patient_summary": None,
+    "urgency_level": None
+}
+
+# Cache policy for read-only endpoints; clients revalidate with If-None-Match
+READ_CACHE_CONTROL = "private, max-age=5"
+
+# Message classes keyed by the stored message type
+MESSAGE_CLASSES = {"ai": AIMessage, "human": HumanMessage}
 
-# Application startup time for uptime calculation
-app_start_time = time.time()
+# Application startup time for uptime calculation (monotonic, immune to wall-clock changes)
+app_start_time = time.monotonic()
 
-# In-memory session storage for active conversations
-sessions: Dict[str, Dict[str, Any]] = {}
+@app.on_event("startup")
+async def init_extractor():
+    """Create the referral letter extractor with a pooled, keep-alive HTTP client."""
+    global extractor
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+    extractor = AsyncReferralLetterExtractor(http_client=http_client)
+
+@app.on_event("shutdown")
+async def close_extractor():
+    """Close the extractor's HTTP connection pool."""
+    if extractor is not None:
+        await extractor.aclose()
+
+def build_conversation_state(messages: List[Any], **values: Any) -> Dict[str, Any]:
+    """Create a conversation state from the defaults, overriding the given values."""
+    state = dict(INITIAL_STATE_TEMPLATE)
+    state.update(values)
+    state["messages"] = messages
+    return state
+
+def build_referral_text(patient_name: Optional[str]) -> str:
+    """Prepare referral letter text for the graph - ONLY patient name."""
+    return f"Patient Name: {patient_name}" if patient_name else ""
+
+def apply_etag(request: Request, response: Response, payload: Any) -> Optional[Response]:
+    """Set ETag/Cache-Control headers for a payload; return a 304 response if the client copy is current."""
+    etag = f'"{hashlib.blake2b(orjson.dumps(payload), digest_size=8).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": READ_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 def generate_session_id(patient_name: str, auth_token: str) -> str:
     """Generate unique session ID for consultation."""
@@ -61,6 +140,22 @@ def generate_session_id(patient_name: str, auth_token: str) -> str:
     base_id = patient_name.replace(" ", "_").lower() if patient_name else "patient"
     return f"{base_id}_{timestamp}_{auth_token[:8]}"
 
+async def load_token_context(auth_token: str):
+    """Get (referral, consultation) for a valid auth token, using the in-process cache when possible."""
+    context = token_context_cache.get(auth_token)
+    if context is None:
+        context = await asyncio.to_thread(db_manager.get_token_context, auth_token)
+        if context is not None:
+            token_context_cache[auth_token] = context
+    return context
+
+def save_upload(file: UploadFile, destination: str) -> int:
+    """Stream an uploaded file to disk and return the number of bytes written."""
+    file.file.seek(0)
+    with open(destination, "wb") as out_file:
+        shutil.copyfileobj(file.file, out_file, length=UPLOAD_CHUNK_SIZE)
+        return out_file.tell()
+
 @app.get("/api/health", response_model=HealthCheckResponse)
 async def health_check():
     """
@@ -69,7 +164,7 @@ async def health_check():
     try:
         # Test database connection
         try:
-            stats = db_manager.get_statistics()
+            stats = await asyncio.to_thread(db_manager.get_statistics)
             database_status = "healthy"
             total_consultations = stats.get("total_consultations", 0)
         except Exception as e:
@@ -77,26 +172,26 @@ async def health_check():
             total_consultations = 0
         
         # Calculate uptime
-        uptime_seconds = time.time() - app_start_time
+        uptime_seconds = time.monotonic() - app_start_time
         
-        return HealthCheckResponse(
+        return HealthCheckResponse.model_construct(
             status="healthy",
             service="Sleep Consultation AI API",
             version="2.0.0",
             database_status=database_status,
-            active_sessions=len(sessions),
+            active_sessions=await session_store.count(),
             total_consultations=total_consultations,
             uptime_seconds=uptime_seconds
         )
     except Exception as e:
-        return HealthCheckResponse(
+        return HealthCheckResponse.model_construct(
             status="unhealthy",
             service="Sleep Consultation AI API",
             version="2.0.0",
             database_status="unknown",
             active_sessions=0,
             total_consultations=0,
-            uptime_seconds=time.time() - app_start_time
+            uptime_seconds=time.monotonic() - app_start_time
         )
 
 @app.post("/api/referral-letter", response_model=ReferralLetterResponse)
@@ -108,59 +203,55 @@ async def upload_referral_letter(file: UploadFile = File(...)):
     if not file.filename or not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    # Validate file size (not empty)
-    content = await file.read()
-    if len(content) == 0:
-        raise HTTPException(status_code=400, detail="File cannot be empty")
+    # Generate permanent file path; the upload is written next to it and renamed once processed
+    timestamp = int(time.time())
+    permanent_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{file.filename}"
+    permanent_path = os.path.join(PDF_STORAGE_DIR, permanent_filename)
+    partial_path = f"{permanent_path}.partial"
     
     try:
-        # Save uploaded file temporarily for processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
+        # Save uploaded file for processing, streaming it in chunks
+        file_size = await asyncio.to_thread(save_upload, file, partial_path)
         
-        try:
-            # Extract information from PDF
-            result = await extractor.process_pdf(tmp_path)
+        # Validate file size (not empty)
+        if file_size == 0:
+            raise HTTPException(status_code=400, detail="File cannot be empty")
+        
+        # Extract information from PDF
+        result = await extractor.process_pdf(partial_path)
+        
+        if result and result.get("patient_name") != "ERROR":
+            # Move file to permanent storage (atomic rename within the same directory)
+            os.replace(partial_path, permanent_path)
             
-            if result and result.get("patient_name") != "ERROR":
-                # Generate permanent file path
-                timestamp = int(time.time())
-                permanent_filename = f"{timestamp}_{file.filename}"
-                permanent_path = os.path.join(PDF_STORAGE_DIR, permanent_filename)
-                
-                # Move file to permanent storage
-                shutil.move(tmp_path, permanent_path)
-                
-                # Save to database and get auth token
-                auth_token = db_manager.save_referral_letter(permanent_path, result)
-                
-                return ReferralLetterResponse(
-                    auth_token=auth_token,
-                    patient_name=result.get("patient_name"),
-                    doctor_name=result.get("doctor_name"),
-                    referral_date=result.get("referral_date"),
-                    referred_to=result.get("referred_to"),
-                    referral_reason=result.get("referral_reason"),
-                    success=True
-                )
-            else:
-                return ReferralLetterResponse(
-                    success=False,
-                    error="Failed to extract information from PDF"
-                )
-                
-        except Exception as e:
-            # Clean up temporary file if it still exists
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            raise e
+            # Save to database and get auth token
+            auth_token = await asyncio.to_thread(db_manager.save_referral_letter, permanent_path, result)
+            
+            return ReferralLetterResponse.model_construct(
+                auth_token=auth_token,
+                patient_name=result.get("patient_name"),
+                doctor_name=result.get("doctor_name"),
+                referral_date=result.get("referral_date"),
+                referred_to=result.get("referred_to"),
+                referral_reason=result.get("referral_reason"),
+                success=True
+            )
+        else:
+            return ReferralLetterResponse.model_construct(
+                success=False,
+                error="Failed to extract information from PDF"
+            )
             
+    except HTTPException:
+        raise
     except Exception as e:
-        return ReferralLetterResponse(
+        return ReferralLetterResponse.model_construct(
             success=False,
             error=f"PDF processing error: {str(e)}"
         )
+    finally:
+        # Remove the partial file unless it was moved to permanent storage
+        Path(partial_path).unlink(missing_ok=True)
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_with_token(request: ChatRequest):
@@ -168,49 +259,33 @@ async def chat_with_token(request: ChatRequest):
     Chat endpoint using auth token. Token becomes invalid after consultation completion.
     """
     try:
-        # Validate auth token
-        if not db_manager.is_token_valid(request.auth_token):
+        # Validate auth token and get referral letter, existing consultation (if any) and active session
+        token_context, session = await asyncio.gather(
+            load_token_context(request.auth_token),
+            session_store.get(request.auth_token)
+        )
+        if not token_context:
             raise HTTPException(status_code=401, detail="Invalid or expired auth token")
         
-        # Get referral letter data
-        referral = db_manager.get_referral_by_token(request.auth_token)
-        if not referral:
-            raise HTTPException(status_code=404, detail="Referral letter not found")
-        
-        # Check if consultation already exists
-        consultation = db_manager.get_consultation_by_token(request.auth_token)
+        referral, consultation = token_context
         
         if not consultation:
             # Create new consultation
             session_id = generate_session_id(referral.patient_name, request.auth_token)
-            consultation_id = db_manager.create_consultation(request.auth_token, session_id, referral.patient_name)
-            
-            # Prepare referral letter text - ONLY patient name
-            referral_text = f"Patient Name: {referral.patient_name}" if referral.patient_name else ""
-            
-            # Initialize conversation state
-            initial_state = {
-                "messages": [],
-                "referral_letter": referral_text,
-                "patient_name": referral.patient_name,
-                "off_topic_counter": 0,
-                "last_question": "",
-                "questions_answered": 0,
-                "summary_confirmed": False,
-                "terminate_reason": None,
-                "doctor_summary": None,
-                "patient_summary": None,
-                "urgency_level": None
-            }
+            consultation_id = await asyncio.to_thread(
+                db_manager.create_consultation, request.auth_token, session_id, referral.patient_name
+            )
+            token_context_cache.pop(request.auth_token, None)
             
             # Generate greeting message using patient name directly
-            if referral.patient_name:
-                greeting_message = f"Hello {referral.patient_name}! I'm Dr. SleepAI, your AI sleep medicine specialist. I'm here to help you with your sleep concerns. Could you please tell me in your own words what's been troubling you with your sleep?"
-            else:
-                greeting_message = get_greeting_message()
+            greeting_message = get_personalized_greeting_message(referral.patient_name)
             
-            # Add greeting to initial state
-            initial_state["messages"] = [AIMessage(content=greeting_message)]
+            # Initialize conversation state with the greeting
+            initial_state = build_conversation_state(
+                [AIMessage(content=greeting_message)],
+                referral_letter=build_referral_text(referral.patient_name),
+                patient_name=referral.patient_name
+            )
             
             # Configure graph with unique thread ID
             config = {
@@ -219,20 +294,22 @@ async def chat_with_token(request: ChatRequest):
             }
             
             # Store session with initial state (don't invoke graph yet)
-            sessions[request.auth_token] = {
+            await session_store.set(request.auth_token, {
                 "state": initial_state,
                 "config": config,
                 "consultation_id": consultation_id
-            }
+            })
             
             # Save greeting message to database
-            db_manager.save_message(consultation_id, request.auth_token, "ai", greeting_message)
-            
-            # Update consultation in database
-            conversation_history = [{"type": "ai", "content": greeting_message}]
-            db_manager.update_consultation(request.auth_token, conversation_history, 0)
+            await asyncio.to_thread(
+                db_manager.commit_turn,
+                consultation_id,
+                request.auth_token,
+                [("ai", greeting_message)],
+                0
+            )
             
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 bot_response=greeting_message,
                 conversation_complete=False,
                 questions_answered=0,
@@ -241,8 +318,16 @@ async def chat_with_token(request: ChatRequest):
         
         else:
             # Continue existing consultation
+            if session is None:
+                # The cached consultation does not track conversation progress; reload it
+                # together with the stored messages before restoring
+                consultation, stored_messages = await asyncio.gather(
+                    asyncio.to_thread(db_manager.get_consultation_by_token, request.auth_token),
+                    asyncio.to_thread(db_manager.get_consultation_history, request.auth_token)
+                )
+            
             if consultation.is_completed:
-                return ChatResponse(
+                return ChatResponse.model_construct(
                     bot_response="This consultation has been completed. Your auth token is no longer valid.",
                     conversation_complete=True,
                     questions_answered=consultation.questions_answered,
@@ -250,7 +335,7 @@ async def chat_with_token(request: ChatRequest):
                 )
             
             # Get or restore session
-            if request.auth_token not in sessions:
+            if session is None:
                 # Restore session from database
                 session_id = consultation.session_id
                 config = {
@@ -258,45 +343,37 @@ async def chat_with_token(request: ChatRequest):
                     "configurable": {"thread_id": session_id}
                 }
                 
-                # Reconstruct state from conversation history
-                messages = []
-                for msg_data in consultation.conversation_history:
-                    if msg_data["type"] == "ai":
-                        messages.append(AIMessage(content=msg_data["content"]))
-                    else:
-                        messages.append(HumanMessage(content=msg_data["content"]))
+                # Reconstruct state from stored messages
+                messages = [
+                    MESSAGE_CLASSES.get(msg_data["type"], HumanMessage)(content=msg_data["content"])
+                    for msg_data in stored_messages
+                ]
                 
-                current_state = {
-                    "messages": messages,
-                    "referral_letter": f"Patient Name: {referral.patient_name}" if referral.patient_name else "",
-                    "patient_name": referral.patient_name,
-                    "off_topic_counter": 0,
-                    "last_question": "",
-                    "questions_answered": consultation.questions_answered,
-                    "summary_confirmed": False,
-                    "terminate_reason": None,
-                    "doctor_summary": consultation.doctor_summary,
-                    "patient_summary": consultation.patient_summary,
-                    "urgency_level": consultation.urgency_level
-                }
+                current_state = build_conversation_state(
+                    messages,
+                    referral_letter=build_referral_text(referral.patient_name),
+                    patient_name=referral.patient_name,
+                    questions_answered=consultation.questions_answered,
+                    doctor_summary=consultation.doctor_summary,
+                    patient_summary=consultation.patient_summary,
+                    urgency_level=consultation.urgency_level
+                )
                 
-                sessions[request.auth_token] = {
+                session = {
                     "state": current_state,
                     "config": config,
                     "consultation_id": consultation.id
                 }
             
-            session = sessions[request.auth_token]
-            
             # Add user message to state
             current_state = session["state"]
             current_state["messages"].append(HumanMessage(content=request.message))
             
-            # Save user message to database
-            db_manager.save_message(session["consultation_id"], request.auth_token, "human", request.message)
-            
             # Get bot response
-            result = graph_app.invoke(current_state, session["config"])
+            async with GRAPH_SEM:
+                result = await asyncio.to_thread(
+                    graph_app.invoke, current_state, session["config"], durability=CHECKPOINT_DURABILITY
+                )
             
             # Update session state
             session["state"] = result
@@ -307,28 +384,19 @@ async def chat_with_token(request: ChatRequest):
             else:
                 bot_response = "I'm sorry, I encountered an issue. Could you please repeat your message?"
             
-            # Save bot response to database
-            db_manager.save_message(session["consultation_id"], request.auth_token, "ai", bot_response)
-            
             # Check if conversation is complete
             conversation_complete = (
                 result.get("terminate_reason") == "completed" or
                 (result.get("summary_confirmed", False) and result.get("doctor_summary"))
             )
             
-            # Update conversation history for database
-            conversation_history = []
-            for msg in result.get("messages", []):
-                if hasattr(msg, 'type'):
-                    msg_type = "ai" if msg.type == "ai" else "human"
-                else:
-                    msg_type = "ai" if isinstance(msg, AIMessage) else "human"
-                conversation_history.append({"type": msg_type, "content": msg.content})
-            
-            # Update consultation in database
-            db_manager.update_consultation(
+            # Save user message and bot response, update consultation and mark token as used
+            # if the conversation is complete, all in a single transaction
+            await asyncio.to_thread(
+                db_manager.commit_turn,
+                session["consultation_id"],
                 request.auth_token,
-                conversation_history,
+                [("human", request.message), ("ai", bot_response)],
                 result.get("questions_answered", 0),
                 result.get("doctor_summary"),
                 result.get("patient_summary"),
@@ -336,14 +404,14 @@ async def chat_with_token(request: ChatRequest):
                 conversation_complete
             )
             
-            # Mark token as used if conversation is complete
             if conversation_complete:
-                db_manager.mark_token_used(request.auth_token)
+                token_context_cache.pop(request.auth_token, None)
                 # Remove from active sessions
-                if request.auth_token in sessions:
-                    del sessions[request.auth_token]
+                await session_store.delete(request.auth_token)
+            else:
+                await session_store.set(request.auth_token, session)
             
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 bot_response=bot_response,
                 conversation_complete=conversation_complete,
                 doctor_summary=result.get("doctor_summary") if conversation_complete else None,
@@ -356,7 +424,7 @@ async def chat_with_token(request: ChatRequest):
     except HTTPException:
         raise
     except Exception as e:
-        return ChatResponse(
+        return ChatResponse.model_construct(
             bot_response="",
             conversation_complete=False,
             questions_answered=0,
@@ -371,68 +439,90 @@ async def search_consultations(
     start_date: Optional[str] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[str] = Query(None, description="End date (ISO format)"),
     sort_by: str = Query("started_at", description="Sort by field"),
-    sort_order: str = Query("desc", description="Sort order (asc/desc)")
+    sort_order: str = Query("desc", description="Sort order (asc/desc)"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of consultations to return"),
+    offset: int = Query(0, ge=0, description="Number of consultations to skip")
 ):
     """
     Search and filter consultations with sorting options.
     """
     try:
-        consultations = db_manager.search_consultations(
+        consultations, total_count = await asyncio.to_thread(
+            db_manager.search_consultations,
             patient_name=patient_name,
             patient_id=patient_id,
             start_date=start_date,
             end_date=end_date,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            limit=limit,
+            offset=offset
         )
         
-        return ConsultationSearchResponse(
+        return ConsultationSearchResponse.model_construct(
             consultations=consultations,
-            total_count=len(consultations),
+            total_count=total_count,
             success=True
         )
     except Exception as e:
-        return ConsultationSearchResponse(
+        return ConsultationSearchResponse.model_construct(
             consultations=[],
             total_count=0,
             success=False
         )
 
 @app.get("/api/consultations/{consultation_id}", response_model=ConsultationDetailsResponse)
-async def get_consultation_details(consultation_id: int):
+async def get_consultation_details(consultation_id: int, request: Request, response: Response):
     """
     Get complete consultation details including referral letter and all messages.
     """
     try:
-        details = db_manager.get_consultation_details(consultation_id)
+        details = await asyncio.to_thread(db_manager.get_consultation_details, consultation_id)
         
         if not details:
             raise HTTPException(status_code=404, detail="Consultation not found")
         
-        return ConsultationDetailsResponse(
+        not_modified = apply_etag(request, response, details)
+        if not_modified:
+            return not_modified
+        
+        return ConsultationDetailsResponse.model_construct(
             consultation=details,
             success=True
         )
     except HTTPException:
         raise
     except Exception as e:
-        return ConsultationDetailsResponse(
+        return ConsultationDetailsResponse.model_construct(
             consultation=None,
             success=False,
             error=f"Error retrieving consultation: {str(e)}"
         )
 
 @app.get("/api/statistics")
-async def get_statistics():
+async def get_statistics(request: Request, response: Response):
     """
     Get database statistics.
     """
     try:
-        stats = db_manager.get_statistics()
+        stats = await asyncio.to_thread(db_manager.get_statistics)
+        
+        not_modified = apply_etag(request, response, stats)
+        if not_modified:
+            return not_modified
+        
         return {"success": True, "data": stats}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several workers need the shared Redis session store (REDIS_URL) to keep conversations coherent
+    default_workers = (os.cpu_count() or 2) if os.getenv("REDIS_URL") else 1
+    uvicorn.run(
+        "app.api:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", default_workers)),
+        log_level="info"
+    )
\ No newline at end of file
@@ -3,23 +3,70 @@ Database models and operations for Sleep Consultation AI
 Uses SQLite for simplicity with SQLAlchemy ORM
 """
 
-import sqlite3
-import json
 import secrets
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, JSON, or_, and_
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+from sqlalchemy import create_engine, event, text, func, case, select, insert, bindparam, Column, Index, Integer, String, Text, DateTime, Boolean, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.orm import sessionmaker, Session, relationship, deferred, joinedload, selectinload
+from sqlalchemy.pool import QueuePool
 
 # Database setup
 DATABASE_URL = "sqlite:///sleep_consultation.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Pooled connections, reused most-recently-used first so a few warm connections serve the load
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_use_lifo=True
+)
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the writer; NORMAL sync defers fsync to checkpoints"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+# Objects stay loaded after commit; they are read after their session is closed
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
+# SQLite 3.45+ can store JSON in its binary JSONB format, which it reads without re-parsing text
+SQLITE_HAS_JSONB = sqlite3.sqlite_version_info >= (3, 45, 0)
+
+# Insert timestamps computed by SQLite inside the INSERT, in the same UTC format as Python-side values.
+# An expression default rather than server_default, so existing tables need no schema change.
+SQL_UTC_NOW = func.strftime("%Y-%m-%d %H:%M:%f", "now")
+
+class JSONB(TypeDecorator):
+    """JSON column stored as SQLite JSONB when available, plain JSON text otherwise.
+    Existing text values stay readable: json() accepts both representations."""
+    impl = JSON
+    cache_ok = True
+
+    def bind_expression(self, bindvalue):
+        return func.jsonb(bindvalue) if SQLITE_HAS_JSONB else bindvalue
+
+    def column_expression(self, column):
+        # type_=self keeps the JSON result processor, so values still load as dicts
+        return func.json(column, type_=self) if SQLITE_HAS_JSONB else column
+
 class ReferralLetter(Base):
     __tablename__ = "referral_letters"
+    __table_args__ = (
+        # Covers the valid-token lookup (auth_token + is_used) without touching the table
+        Index("ix_referral_token_used", "auth_token", "is_used"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     auth_token = Column(String(64), unique=True, index=True)
@@ -29,8 +76,9 @@ class ReferralLetter(Base):
     referred_to = Column(String(255))
     referral_reason = Column(Text)
     pdf_path = Column(String(500))  # Path to saved PDF file
-    extracted_data = Column(JSON)  # Full extracted data as JSON
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Full extracted data as JSON; deferred since reads only need the promoted columns above
+    extracted_data = deferred(Column(JSONB))
+    created_at = Column(DateTime, default=SQL_UTC_NOW)
     is_used = Column(Boolean, default=False)  # Token used flag
 
 class Consultation(Base):
@@ -40,51 +88,135 @@ class Consultation(Base):
     auth_token = Column(String(64), index=True)
     session_id = Column(String(100))
     patient_name = Column(String(255))
-    conversation_history = Column(JSON)  # All messages
+    # Legacy transcript, no longer written: the messages table holds the history,
+    # reconstructed on demand by get_consultation_history
+    conversation_history = deferred(Column(JSONB))
     doctor_summary = Column(Text)
     patient_summary = Column(Text)
     urgency_level = Column(String(20))
     questions_answered = Column(Integer, default=0)
     is_completed = Column(Boolean, default=False)
-    started_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=SQL_UTC_NOW)
     completed_at = Column(DateTime)
+    
+    # Read-only links through auth_token (the tables have no foreign keys)
+    referral = relationship(
+        "ReferralLetter",
+        primaryjoin="foreign(ReferralLetter.auth_token) == Consultation.auth_token",
+        uselist=False,
+        viewonly=True
+    )
+    messages = relationship(
+        "Message",
+        primaryjoin="foreign(Message.auth_token) == Consultation.auth_token",
+        order_by="(Message.timestamp, Message.id)",
+        viewonly=True
+    )
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves per-token message history already in timestamp order
+        Index("ix_msg_token_ts", "auth_token", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     consultation_id = Column(Integer)
-    auth_token = Column(String(64), index=True)
+    auth_token = Column(String(64))
     message_type = Column(String(10))  # 'human' or 'ai'
     content = Column(Text)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=SQL_UTC_NOW)
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# create_all skips indexes of tables that already exist; add newer ones to existing databases
+for table in (ReferralLetter.__table__, Message.__table__):
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# Full-text index on patient names, kept in sync with consultations by triggers
+CONSULTATIONS_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS consultations_fts USING fts5(
+        patient_name, content='consultations', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS consultations_fts_ai AFTER INSERT ON consultations BEGIN
+        INSERT INTO consultations_fts(rowid, patient_name) VALUES (new.id, new.patient_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS consultations_fts_ad AFTER DELETE ON consultations BEGIN
+        INSERT INTO consultations_fts(consultations_fts, rowid, patient_name) VALUES ('delete', old.id, old.patient_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS consultations_fts_au AFTER UPDATE OF patient_name ON consultations BEGIN
+        INSERT INTO consultations_fts(consultations_fts, rowid, patient_name) VALUES ('delete', old.id, old.patient_name);
+        INSERT INTO consultations_fts(rowid, patient_name) VALUES (new.id, new.patient_name);
+    END""",
+    # Index consultations that existed before the FTS table
+    "INSERT INTO consultations_fts(consultations_fts) VALUES ('rebuild')"
+]
+
+def setup_consultations_fts() -> bool:
+    """Create the patient-name FTS5 index if missing; False when SQLite lacks FTS5"""
+    with engine.begin() as conn:
+        options = {row[0] for row in conn.exec_driver_sql("PRAGMA compile_options")}
+        if "ENABLE_FTS5" not in options:
+            return False
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'consultations_fts'"
+        ).first()
+        if not exists:
+            for statement in CONSULTATIONS_FTS_DDL:
+                conn.exec_driver_sql(statement)
+    return True
+
+HAS_CONSULTATIONS_FTS = setup_consultations_fts()
+CONSULTATIONS_FTS_MATCH = text(
+    "SELECT rowid FROM consultations_fts WHERE consultations_fts MATCH :query"
+).columns(rowid=Integer)
+
+def fts_prefix_query(value: str) -> str:
+    """FTS5 query matching every word of value as a prefix, with FTS syntax quoted away"""
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in value.split())
+
+# Hot per-token lookups, built once and executed with a bound auth_token
+REFERRAL_BY_TOKEN = select(ReferralLetter).where(
+    ReferralLetter.auth_token == bindparam("auth_token")
+).limit(1)
+VALID_TOKEN = select(ReferralLetter.id).where(
+    ReferralLetter.auth_token == bindparam("auth_token"),
+    ReferralLetter.is_used == False
+).limit(1)
+TOKEN_CONTEXT = select(ReferralLetter, Consultation).outerjoin(
+    Consultation, Consultation.auth_token == ReferralLetter.auth_token
+).where(
+    ReferralLetter.auth_token == bindparam("auth_token"),
+    ReferralLetter.is_used == False
+).limit(1)
+CONSULTATION_BY_TOKEN = select(Consultation).where(
+    Consultation.auth_token == bindparam("auth_token")
+).limit(1)
+INSERT_MESSAGE = insert(Message)
+
 class DatabaseManager:
     def __init__(self):
         self.engine = engine
     
-    def get_db(self) -> Session:
-        """Get database session"""
-        db = SessionLocal()
-        try:
-            return db
-        finally:
-            pass  # Don't close here, let caller handle it
+    @contextmanager
+    def _session(self) -> Iterator[Session]:
+        """Provide a database session that is closed when the block exits"""
+        with SessionLocal() as db:
+            yield db
     
     def generate_auth_token(self) -> str:
         """Generate secure auth token"""
-        return secrets.token_urlsafe(48)
+        # 256 bits in 43 characters: shorter index keys than the previous 64, same String(64) column
+        return secrets.token_urlsafe(32)
     
     def save_referral_letter(self, pdf_path: str, extracted_data: Dict[str, Any]) -> str:
         """Save referral letter and return auth token"""
-        db = self.get_db()
-        try:
+        with self._session() as db:
             auth_token = self.generate_auth_token()
             
-            referral = ReferralLetter(
+            db.execute(insert(ReferralLetter).values(
                 auth_token=auth_token,
                 patient_name=extracted_data.get("patient_name"),
                 doctor_name=extracted_data.get("doctor_name"),
@@ -94,122 +226,132 @@ class DatabaseManager:
                 pdf_path=pdf_path,
                 extracted_data=extracted_data,
                 is_used=False
-            )
-            
-            db.add(referral)
+            ))
             db.commit()
-            db.refresh(referral)
             
             return auth_token
-        finally:
-            db.close()
     
     def get_referral_by_token(self, auth_token: str) -> Optional[ReferralLetter]:
         """Get referral letter by auth token"""
-        db = self.get_db()
-        try:
-            return db.query(ReferralLetter).filter(ReferralLetter.auth_token == auth_token).first()
-        finally:
-            db.close()
+        with self._session() as db:
+            return db.scalars(REFERRAL_BY_TOKEN, {"auth_token": auth_token}).first()
     
     def is_token_valid(self, auth_token: str) -> bool:
         """Check if auth token is valid and not used"""
-        db = self.get_db()
-        try:
-            referral = db.query(ReferralLetter).filter(
-                ReferralLetter.auth_token == auth_token,
-                ReferralLetter.is_used == False
-            ).first()
-            return referral is not None
-        finally:
-            db.close()
+        with self._session() as db:
+            return db.scalar(VALID_TOKEN, {"auth_token": auth_token}) is not None
+    
+    def get_token_context(self, auth_token: str) -> Optional[Tuple[ReferralLetter, Optional[Consultation]]]:
+        """Get referral letter and consultation for a valid (unused) auth token in a single query"""
+        with self._session() as db:
+            row = db.execute(TOKEN_CONTEXT, {"auth_token": auth_token}).first()
+            return (row[0], row[1]) if row else None
     
     def mark_token_used(self, auth_token: str):
         """Mark auth token as used"""
-        db = self.get_db()
-        try:
+        with self._session() as db:
             referral = db.query(ReferralLetter).filter(ReferralLetter.auth_token == auth_token).first()
             if referral:
                 referral.is_used = True
                 db.commit()
-        finally:
-            db.close()
     
     def create_consultation(self, auth_token: str, session_id: str, patient_name: str) -> int:
         """Create new consultation record"""
-        db = self.get_db()
-        try:
-            consultation = Consultation(
+        with self._session() as db:
+            consultation_id = db.execute(insert(Consultation).values(
                 auth_token=auth_token,
                 session_id=session_id,
                 patient_name=patient_name,
-                conversation_history=[],
                 is_completed=False
-            )
-            
-            db.add(consultation)
+            ).returning(Consultation.id)).scalar_one()
             db.commit()
-            db.refresh(consultation)
             
-            return consultation.id
-        finally:
-            db.close()
+            return consultation_id
     
     def get_consultation_by_token(self, auth_token: str) -> Optional[Consultation]:
         """Get consultation by auth token"""
-        db = self.get_db()
-        try:
-            return db.query(Consultation).filter(Consultation.auth_token == auth_token).first()
-        finally:
-            db.close()
+        with self._session() as db:
+            return db.scalars(CONSULTATION_BY_TOKEN, {"auth_token": auth_token}).first()
     
     def save_message(self, consultation_id: int, auth_token: str, message_type: str, content: str):
         """Save individual message"""
-        db = self.get_db()
-        try:
-            message = Message(
-                consultation_id=consultation_id,
-                auth_token=auth_token,
-                message_type=message_type,
-                content=content
-            )
-            
-            db.add(message)
+        self.save_messages(consultation_id, auth_token, [(message_type, content)])
+    
+    @staticmethod
+    def _insert_messages(db: Session, consultation_id: int, auth_token: str, messages: List[Tuple[str, str]]):
+        """Insert (message_type, content) messages as one Core executemany, bypassing the ORM mapper"""
+        db.execute(INSERT_MESSAGE, [
+            {
+                "consultation_id": consultation_id,
+                "auth_token": auth_token,
+                "message_type": message_type,
+                "content": content
+            }
+            for message_type, content in messages
+        ])
+    
+    def save_messages(self, consultation_id: int, auth_token: str, messages: List[Tuple[str, str]]):
+        """Save several (message_type, content) messages in a single transaction"""
+        with self._session() as db:
+            self._insert_messages(db, consultation_id, auth_token, messages)
             db.commit()
-        finally:
-            db.close()
     
-    def update_consultation(self, auth_token: str, conversation_history: List[Dict], 
-                          questions_answered: int, doctor_summary: str = None, 
-                          patient_summary: str = None, urgency_level: str = None, 
-                          is_completed: bool = False):
+    @staticmethod
+    def _consultation_update_values(questions_answered: int,
+                                    doctor_summary: str = None, patient_summary: str = None,
+                                    urgency_level: str = None, is_completed: bool = False) -> Dict[str, Any]:
+        """Columns to write for the latest conversation data; fields without a new value are left out"""
+        values = {"questions_answered": questions_answered}
+        
+        if doctor_summary:
+            values["doctor_summary"] = doctor_summary
+        if patient_summary:
+            values["patient_summary"] = patient_summary
+        if urgency_level:
+            values["urgency_level"] = urgency_level
+        if is_completed:
+            values["is_completed"] = True
+            values["completed_at"] = datetime.utcnow()
+        return values
+    
+    def update_consultation(self, auth_token: str, questions_answered: int, 
+                          doctor_summary: str = None, patient_summary: str = None, 
+                          urgency_level: str = None, is_completed: bool = False):
         """Update consultation with latest data"""
-        db = self.get_db()
-        try:
-            consultation = db.query(Consultation).filter(Consultation.auth_token == auth_token).first()
-            if consultation:
-                consultation.conversation_history = conversation_history
-                consultation.questions_answered = questions_answered
-                
-                if doctor_summary:
-                    consultation.doctor_summary = doctor_summary
-                if patient_summary:
-                    consultation.patient_summary = patient_summary
-                if urgency_level:
-                    consultation.urgency_level = urgency_level
-                if is_completed:
-                    consultation.is_completed = True
-                    consultation.completed_at = datetime.utcnow()
-                
-                db.commit()
-        finally:
-            db.close()
+        with self._session() as db:
+            # Single UPDATE of the changed columns; no SELECT of the row first
+            db.query(Consultation).filter(Consultation.auth_token == auth_token).update(
+                self._consultation_update_values(
+                    questions_answered, doctor_summary, patient_summary, urgency_level, is_completed
+                ),
+                synchronize_session=False
+            )
+            db.commit()
+    
+    def commit_turn(self, consultation_id: int, auth_token: str, messages: List[Tuple[str, str]],
+                    questions_answered: int, doctor_summary: str = None, patient_summary: str = None,
+                    urgency_level: str = None, is_completed: bool = False):
+        """Save new (message_type, content) messages, update consultation and, once completed,
+        mark the auth token as used - all in a single transaction"""
+        with self._session() as db:
+            self._insert_messages(db, consultation_id, auth_token, messages)
+            
+            db.query(Consultation).filter(Consultation.auth_token == auth_token).update(
+                self._consultation_update_values(
+                    questions_answered, doctor_summary, patient_summary, urgency_level, is_completed
+                ),
+                synchronize_session=False
+            )
+            
+            if is_completed:
+                db.query(ReferralLetter).filter(ReferralLetter.auth_token == auth_token).update({"is_used": True})
+            
+            db.commit()
     
     def get_consultation_history(self, auth_token: str) -> List[Dict]:
         """Get all messages for a consultation"""
-        db = self.get_db()
-        try:
-            messages = db.query(Message).filter(Message.auth_token == auth_token).order_by(Message.timestamp).all()
+        with self._session() as db:
+            messages = db.query(Message).filter(Message.auth_token == auth_token).order_by(Message.timestamp, Message.id).all()
             return [
                 {
                     "type": msg.message_type,
@@ -218,20 +360,38 @@ class DatabaseManager:
                 }
                 for msg in messages
             ]
-        finally:
-            db.close()
     
     def search_consultations(self, patient_name: str = None, patient_id: int = None, 
                            start_date: str = None, end_date: str = None, 
-                           sort_by: str = "created_at", sort_order: str = "desc") -> List[Dict]:
-        """Search and filter consultations with sorting"""
-        db = self.get_db()
-        try:
-            query = db.query(Consultation)
+                           sort_by: str = "created_at", sort_order: str = "desc",
+                           limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Search and filter consultations with sorting; returns one page and the total match count"""
+        with self._session() as db:
+            # Only the listed columns, as plain rows rather than hydrated Consultation objects
+            query = db.query(
+                Consultation.id,
+                Consultation.auth_token,
+                Consultation.patient_name,
+                Consultation.is_completed,
+                Consultation.questions_answered,
+                Consultation.urgency_level,
+                Consultation.doctor_summary,
+                Consultation.patient_summary,
+                Consultation.started_at,
+                Consultation.completed_at,
+                # Total matches before LIMIT/OFFSET, computed in the same query
+                func.count().over().label("total_count")
+            )
             
             # Apply filters
             if patient_name:
-                query = query.filter(Consultation.patient_name.ilike(f"%{patient_name}%"))
+                if HAS_CONSULTATIONS_FTS and patient_name.strip():
+                    # Word-prefix match through the FTS index instead of a full-scan substring LIKE
+                    query = query.filter(Consultation.id.in_(
+                        CONSULTATIONS_FTS_MATCH.bindparams(query=fts_prefix_query(patient_name)).scalar_subquery()
+                    ))
+                else:
+                    query = query.filter(Consultation.patient_name.ilike(f"%{patient_name}%"))
             
             if patient_id:
                 query = query.filter(Consultation.id == patient_id)
@@ -243,6 +403,7 @@ class DatabaseManager:
             if end_date:
                 end_dt = datetime.fromisoformat(end_date)
                 query = query.filter(Consultation.started_at <= end_dt)
+            filtered = query
             
             # Apply sorting
             if sort_by == "patient_name":
@@ -254,12 +415,23 @@ class DatabaseManager:
             else:
                 order_col = Consultation.started_at
             
+            # id breaks ties so pages don't overlap
             if sort_order.lower() == "asc":
-                query = query.order_by(order_col.asc())
+                query = query.order_by(order_col.asc(), Consultation.id.asc())
             else:
-                query = query.order_by(order_col.desc())
+                query = query.order_by(order_col.desc(), Consultation.id.desc())
+            
+            if limit is not None:
+                query = query.limit(limit).offset(offset)
             
             consultations = query.all()
+            if consultations:
+                total_count = consultations[0].total_count
+            elif offset:
+                # A page past the last match has no rows to carry the window count
+                total_count = filtered.with_entities(func.count(Consultation.id)).scalar()
+            else:
+                total_count = 0
             
             return [
                 {
@@ -275,23 +447,21 @@ class DatabaseManager:
                     "completed_at": c.completed_at.isoformat() if c.completed_at else None
                 }
                 for c in consultations
-            ]
-        finally:
-            db.close()
+            ], total_count
     
     def get_consultation_details(self, consultation_id: int) -> Optional[Dict]:
         """Get complete consultation details including referral letter and messages"""
-        db = self.get_db()
-        try:
-            consultation = db.query(Consultation).filter(Consultation.id == consultation_id).first()
+        with self._session() as db:
+            # Consultation and referral letter in one joined query, messages in one follow-up query
+            consultation = db.query(Consultation).options(
+                joinedload(Consultation.referral),
+                selectinload(Consultation.messages)
+            ).filter(Consultation.id == consultation_id).one_or_none()
             if not consultation:
                 return None
             
-            # Get referral letter
-            referral = db.query(ReferralLetter).filter(ReferralLetter.auth_token == consultation.auth_token).first()
-            
-            # Get all messages
-            messages = db.query(Message).filter(Message.auth_token == consultation.auth_token).order_by(Message.timestamp).all()
+            referral = consultation.referral
+            messages = consultation.messages
             
             return {
                 "consultation": {
@@ -326,25 +496,32 @@ class DatabaseManager:
                     for msg in messages
                 ]
             }
-        finally:
-            db.close()
     
     def get_all_consultations(self) -> List[Dict]:
         """Get all consultations (admin function)"""
-        return self.search_consultations()
+        consultations, _ = self.search_consultations()
+        return consultations
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get database statistics"""
-        db = self.get_db()
-        try:
-            total_consultations = db.query(Consultation).count()
-            completed_consultations = db.query(Consultation).filter(Consultation.is_completed == True).count()
+        with self._session() as db:
+            # All counts in a single pass over consultations (SUM is NULL on an empty table)
+            row = db.query(
+                func.count(Consultation.id),
+                func.sum(case((Consultation.is_completed == True, 1), else_=0)),
+                func.sum(case((Consultation.urgency_level == "high", 1), else_=0)),
+                func.sum(case((Consultation.urgency_level == "moderate", 1), else_=0)),
+                func.sum(case((Consultation.urgency_level == "routine", 1), else_=0))
+            ).one()
+            
+            total_consultations = row[0]
+            completed_consultations = row[1] or 0
             pending_consultations = total_consultations - completed_consultations
             
             # Urgency level breakdown
-            high_urgency = db.query(Consultation).filter(Consultation.urgency_level == "high").count()
-            moderate_urgency = db.query(Consultation).filter(Consultation.urgency_level == "moderate").count()
-            routine_urgency = db.query(Consultation).filter(Consultation.urgency_level == "routine").count()
+            high_urgency = row[2] or 0
+            moderate_urgency = row[3] or 0
+            routine_urgency = row[4] or 0
             
             return {
                 "total_consultations": total_consultations,
@@ -356,8 +533,6 @@ class DatabaseManager:
                     "routine": routine_urgency
                 }
             }
-        finally:
-            db.close()
 
 # Global database manager instance
 db_manager = DatabaseManager()
\ No newline at end of file
@@ -3,8 +3,18 @@ Main entry point for Sleep Consultation AI API
 Run with: python -m app.main or uvicorn app.main:app
 """
 
+import os
+
 from app.api import app
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8010)
\ No newline at end of file
+    # Several workers need the shared Redis session store (REDIS_URL) to keep conversations coherent
+    default_workers = (os.cpu_count() or 2) if os.getenv("REDIS_URL") else 1
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8010,
+        workers=int(os.getenv("WEB_CONCURRENCY", default_workers)),
+        log_level="info"
+    )
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Active conversation session storage for Sleep Consultation AI API
+In-process TTL cache by default; Redis when REDIS_URL is set so all workers share warm sessions.
+"""
+
+import os
+import json
+import time
+from typing import Optional, Dict, Any
+from cachetools import TTLCache
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "1024"))
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "3600"))
+
+class InMemorySessionStore:
+    """Per-process session store. Bounded and time-limited; evicted sessions are
+    restored from the database on the next message."""
+
+    def __init__(self, maxsize: int = SESSION_CACHE_MAX, ttl: int = SESSION_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, auth_token: str) -> Optional[Dict[str, Any]]:
+        """Get session by auth token"""
+        return self._cache.get(auth_token)
+
+    async def set(self, auth_token: str, session: Dict[str, Any]):
+        """Store session for auth token"""
+        self._cache[auth_token] = session
+
+    async def delete(self, auth_token: str):
+        """Remove session for auth token"""
+        self._cache.pop(auth_token, None)
+
+    async def count(self) -> int:
+        """Number of active sessions"""
+        return len(self._cache)
+
+def dumps_session(session: Dict[str, Any]) -> str:
+    """Serialize a session as JSON; graph messages are stored in LangChain's dict form"""
+    state = session["state"]
+    return json.dumps({**session, "state": {**state, "messages": messages_to_dict(state["messages"])}})
+
+def loads_session(raw) -> Dict[str, Any]:
+    """Restore a session serialized by dumps_session"""
+    session = json.loads(raw)
+    session["state"]["messages"] = messages_from_dict(session["state"]["messages"])
+    return session
+
+class RedisSessionStore:
+    """Session store shared by all workers through Redis. Sessions are stored as JSON, never pickled,
+    so a value written to Redis cannot run code in the workers."""
+
+    key_prefix = "sess:"
+    # Sorted set of active auth tokens scored by expiry time, so counting sessions needs no keyspace scan
+    active_key = "sessions:active"
+
+    def __init__(self, url: str, ttl: int = SESSION_CACHE_TTL):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+        self._ttl = ttl
+
+    async def get(self, auth_token: str) -> Optional[Dict[str, Any]]:
+        """Get session by auth token"""
+        raw = await self._client.get(f"{self.key_prefix}{auth_token}")
+        return loads_session(raw) if raw else None
+
+    async def set(self, auth_token: str, session: Dict[str, Any]):
+        """Store session for auth token"""
+        now = time.time()
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.set(f"{self.key_prefix}{auth_token}", dumps_session(session), ex=self._ttl)
+            pipe.zadd(self.active_key, {auth_token: now + self._ttl})
+            pipe.zremrangebyscore(self.active_key, "-inf", now)
+            await pipe.execute()
+
+    async def delete(self, auth_token: str):
+        """Remove session for auth token"""
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.delete(f"{self.key_prefix}{auth_token}")
+            pipe.zrem(self.active_key, auth_token)
+            await pipe.execute()
+
+    async def count(self) -> int:
+        """Number of active sessions"""
+        return await self._client.zcount(self.active_key, time.time(), "+inf")
+
+def create_session_store():
+    """Create the session store configured by the environment"""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        return RedisSessionStore(redis_url)
+    return InMemorySessionStore()
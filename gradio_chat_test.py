@@ -1,13 +1,11 @@
 import gradio as gr
-import asyncio
-import tempfile
-import os
 import random
 import string
 from langchain_core.messages import HumanMessage, AIMessage
 
 # Import our modules
-from src.bot.graph import app
+from src.bot.graph import app, CHECKPOINT_DURABILITY
+from src.bot.helper import get_personalized_greeting_message
 from src.referal_letter.extraction import AsyncReferralLetterExtractor
 
 class SleepConsultationChat:
@@ -24,16 +22,8 @@ class SleepConsultationChat:
             return "No file uploaded", ""
             
         try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(pdf_file)
-                tmp_path = tmp_file.name
-            
-            # Extract information from PDF
-            result = await self.extractor.process_pdf(tmp_path)
-            
-            # Clean up temporary file
-            os.unlink(tmp_path)
+            # Extract information from the uploaded PDF bytes
+            result = await self.extractor.process_pdf_bytes(pdf_file)
             
             if result and result.get("patient_name") != "ERROR":
                 self.referral_data = result
@@ -84,12 +74,7 @@ class SleepConsultationChat:
             }
             
             # Generate personalized greeting using patient name directly
-            if final_patient_name:
-                greeting_message = f"Hello {final_patient_name}! I'm Dr. SleepAI, your AI sleep medicine specialist. I'm here to help you with your sleep concerns. Could you please tell me in your own words what's been troubling you with your sleep?"
-            else:
-                # Default greeting without patient name
-                from src.bot.helper import get_greeting_message
-                greeting_message = get_greeting_message()
+            greeting_message = get_personalized_greeting_message(final_patient_name)
             
             # Initialize conversation state with greeting message and ensure all required fields are set
             initial_state = {
@@ -107,7 +92,7 @@ class SleepConsultationChat:
             }
             
             # Start the conversation - this will trigger the graph flow
-            result = app.invoke(initial_state, config)
+            result = app.invoke(initial_state, config, durability=CHECKPOINT_DURABILITY)
             
             # Ensure the initial greeting message is preserved in the result
             if result.get('messages') and len(result['messages']) > 0:
@@ -160,7 +145,7 @@ class SleepConsultationChat:
             
             # Pass only the new user message - let LangGraph's checkpointer handle state management
             inputs = {"messages": [HumanMessage(content=message)]}
-            result = app.invoke(inputs, config)
+            result = app.invoke(inputs, config, durability=CHECKPOINT_DURABILITY)
             
             # Get the complete updated state from LangGraph's checkpointer
             updated_state = app.get_state(config)
@@ -214,11 +199,12 @@ class SleepConsultationChat:
 # Initialize the chat system
 chat_system = SleepConsultationChat()
 
-# Async wrapper for PDF processing
-def process_pdf_sync(pdf_file):
+# PDF processing handler; Gradio awaits it on its long-lived event loop,
+# so the extractor's HTTP connections are reused across uploads
+async def process_pdf(pdf_file):
     if pdf_file is None:
         return "No file uploaded", ""
-    return asyncio.run(chat_system.process_referral_letter(pdf_file))
+    return await chat_system.process_referral_letter(pdf_file)
 
 # Create Gradio interface
 with gr.Blocks(title="Sleep Consultation AI", theme=gr.themes.Soft()) as demo:
@@ -272,7 +258,7 @@ with gr.Blocks(title="Sleep Consultation AI", theme=gr.themes.Soft()) as demo:
     
     # Event handlers
     pdf_upload.change(
-        fn=process_pdf_sync,
+        fn=process_pdf,
         inputs=[pdf_upload],
         outputs=[referral_info, patient_name_display]
     )
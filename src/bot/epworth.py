@@ -0,0 +1,89 @@
+"""
+Epworth Sleepiness Scale administered and scored in Python.
+The 8 situations are asked one at a time without an LLM call, answers are parsed locally and the total
+is interpreted with the same bands the prompts use. A situation still without a score after it was asked
+again is recorded as None (not scored), so the scale always completes.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Optional
+
+from .helper import EPWORTH_SITUATIONS
+
+EPWORTH_QUESTION = (
+    "On a scale of 0-3, how likely are you to doze off or fall asleep in this situation: {situation}? "
+    "(0 = would never doze, 1 = slight chance, 2 = moderate chance, 3 = high chance)"
+)
+EPWORTH_REPEAT = "I need a single number from 0 to 3 for this one. " + EPWORTH_QUESTION
+
+# Upper bound of each interpretation band (0-7=normal, 8-9=mild, 10-15=moderate, 16-24=severe)
+_ESS_BUCKETS = ((7, "normal"), (9, "mild"), (15, "moderate"), (24, "severe sleepiness"))
+_ESS_BOUNDS = tuple(bound for bound, _ in _ESS_BUCKETS)
+ESS_HIGH_RISK_ABOVE = 20
+
+# Only the scale's own wording is scored; other words ("never drive", "not high") are left to the repeat
+_SCORE_PHRASES = {
+    "no chance": 0, "would never doze": 0, "slight chance": 1, "moderate chance": 2, "high chance": 3,
+}
+_SCORE_RE = re.compile(r"(?<![\d.])(\d+)(?![\d.])")
+_SCORE_PHRASE_RE = re.compile(r"\b(" + "|".join(_SCORE_PHRASES).replace(" ", r"\s+") + r")\b")
+
+EpworthScores = Dict[str, Optional[int]]
+
+def next_epworth_situation(scores: EpworthScores) -> Optional[str]:
+    """The first situation without a score, or None when the scale is complete."""
+    return next((situation for situation in EPWORTH_SITUATIONS if situation not in scores), None)
+
+def epworth_complete(scores: EpworthScores) -> bool:
+    """True when all 8 situations have a score or were left unscored."""
+    return next_epworth_situation(scores) is None
+
+def epworth_question(situation: str, repeat: bool = False) -> str:
+    """The question for one situation; repeat asks again after an answer that was not a 0-3 score."""
+    return (EPWORTH_REPEAT if repeat else EPWORTH_QUESTION).format(situation=situation.lower())
+
+def parse_epworth_answer(answer: str) -> Optional[int]:
+    """
+    Read a 0-3 score from the patient's answer: the first number, or a scale phrase ("slight chance").
+    None if the answer holds no valid score.
+    """
+    text = answer.lower()
+    match = _SCORE_RE.search(text)
+    if match:
+        score = int(match.group(1))
+        return score if score <= 3 else None
+    match = _SCORE_PHRASE_RE.search(text)
+    return _SCORE_PHRASES[" ".join(match.group(1).split())] if match else None
+
+def epworth_total(scores: EpworthScores) -> int:
+    """Total ESS score (0-24) over the scored situations."""
+    return sum(score for score in scores.values() if score is not None)
+
+def epworth_interpretation(total: int) -> str:
+    """Interpretation band of a total ESS score."""
+    return _ESS_BUCKETS[bisect_left(_ESS_BOUNDS, total)][1]
+
+def epworth_report(scores: EpworthScores) -> str:
+    """Scores, total and interpretation as text for the summary prompts."""
+    if not scores:
+        return "Not administered."
+    lines = [
+        f"- {situation}: {'not scored (no 0-3 answer)' if scores[situation] is None else scores[situation]}"
+        for situation in EPWORTH_SITUATIONS if situation in scores
+    ]
+    if not epworth_complete(scores):
+        lines.append(f"Incomplete: {len(scores)} of {len(EPWORTH_SITUATIONS)} situations answered.")
+        return "\n".join(lines)
+    total = epworth_total(scores)
+    unscored = sum(score is None for score in scores.values())
+    if unscored:
+        lines.append(
+            f"Partial ESS score: {total}/24 from {len(scores) - unscored} of {len(EPWORTH_SITUATIONS)} situations "
+            f"({unscored} not scored); the full total may be higher, do not interpret it as a complete score"
+        )
+    else:
+        lines.append(f"Total ESS score: {total}/24 ({epworth_interpretation(total)})")
+    if total > ESS_HIGH_RISK_ABOVE:
+        lines.append(f"HIGH RISK: ESS score over {ESS_HIGH_RISK_ABOVE}")
+    return "\n".join(lines)
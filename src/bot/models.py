@@ -36,6 +36,30 @@ class SuicideCheckDecision(BaseModel):
     )
 
 
+class MessageSafetyDecision(BaseModel):
+    """Strukturirani izlaz za guardrail klasifikaciju i proveru rizika od samopovređivanja u jednom pozivu."""
+    topic: GuardrailDecision = Field(
+        description="Topic classification of the user's current message"
+    )
+    risk: SuicideCheckDecision = Field(
+        description="Self-harm risk assessment of the conversation"
+    )
+
+
+class TurnTriage(MessageSafetyDecision):
+    """Strukturirani izlaz za guardrail klasifikaciju, proveru rizika i odluku rutera u jednom pozivu."""
+    next_action: Literal["ask_question", "generate_summary"] = Field(
+        description="Decision to either ask another question or generate a summary."
+    )
+
+
+class QuestionBatch(BaseModel):
+    """Strukturirani izlaz za prvo pitanje i unapred pripremljena naredna pitanja."""
+    questions: List[str] = Field(
+        description="The question to ask now, followed by up to 4 prepared follow-up questions in the order they will be asked."
+    )
+
+
 class SleepSummary(BaseModel):
     """Strukturirani izlaz za sažetak spavanja."""
     doctor_summary: str = Field(
@@ -0,0 +1,32 @@
+"""
+Deterministic routing gates for the sleep consultation.
+Conditions over structured state are checked in Python; the LLM router only judges whether the conversation
+is rich enough (and whether PSQI is complete for insomnia patients) once every gate has passed.
+"""
+
+from typing import Iterable, Optional
+
+from .epworth import epworth_complete
+from .helper import HIGH_RISK_SCREENING_QUESTIONS
+
+MIN_QUESTIONS_ANSWERED = 5
+
+def next_unscreened_topic(screened_topics: Iterable[str]) -> Optional[str]:
+    """The first high-risk screening topic whose standard question has not been asked yet, or None."""
+    screened = set(screened_topics)
+    return next((topic for topic in HIGH_RISK_SCREENING_QUESTIONS if topic not in screened), None)
+
+def deterministic_route(state) -> Optional[str]:
+    """
+    Routing decision from the gates over structured state: summary already confirmed, at least 5 answers,
+    complete Epworth scale, high-risk screening asked. None when only the LLM router can decide.
+    """
+    if state.get("summary_confirmed", False):
+        return "generate_summary"
+    if state.get("questions_answered", 0) < MIN_QUESTIONS_ANSWERED:
+        return "ask_question"
+    if not epworth_complete(state.get("epworth_scores") or {}):
+        return "ask_question"
+    if next_unscreened_topic(state.get("screened_topics") or []) is not None:
+        return "ask_question"
+    return None
@@ -2,9 +2,9 @@
 Schema definitions for the sleep consultation bot state management.
 """
 
-from typing import List, TypedDict, Annotated
+from typing import Dict, List, Literal, Optional, TypedDict, Annotated
 from langchain_core.messages import AnyMessage
-import operator
+from langgraph.graph.message import add_messages
 
 
 class GraphState(TypedDict):
@@ -19,19 +19,37 @@ class GraphState(TypedDict):
         last_question: Poslednje pitanje koje je AI postavio, za ponovno postavljanje.
         questions_answered: Brojač odgovorenih pitanja tokom konsultacije.
         summary_confirmed: Zastavica koja prati da li je pacijent već dobio priliku da doda informacije u sažetak.
-        terminate_reason: Razlog prekida konverzacije (npr. 'self_harm', 'off_topic_limit', 'completed').
+        terminate_reason: Razlog prekida konverzacije ('self_harm_risk', 'off_topic_limit', 'completed').
         doctor_summary: Profesionalni sažetak za lekara sa kliničkom terminologijom.
         patient_summary: Sažetak za pacijenta u pristupačnom jeziku.
-        urgency_level: Nivo hitnosti - 'high' za suicide/guardrail/urgent medical, 'routine' inače.
+        urgency_level: Nivo hitnosti - 'high' za suicide/guardrail/urgent medical, 'moderate' ili 'routine' inače.
+        pending_questions: Unapred pripremljena pitanja koja se postavljaju redom, bez novog LLM poziva.
+        next_action: Odluka rutera doneta zajedno sa guardrail klasifikacijom, None ako nije doneta u ovom koraku.
+        history_str: Konverzacija formatirana kao "tip: sadržaj" linije, dopunjuje se samo novim porukama.
+        history_len: Broj poruka obuhvaćenih u history_str.
+        rolling_summary: Sažetak starijih poruka; promptovima se šalje on i samo poslednje poruke.
+        rolling_summary_len: Broj početnih poruka obuhvaćenih u rolling_summary.
+        epworth_scores: Ocene 0-3 po Epworth situaciji, bodovane lokalno bez LLM-a; None za situaciju bez ocene ni posle ponovljenog pitanja.
+        epworth_pending: Epworth situacija na koju se čeka odgovor, None ako nijedna nije postavljena.
+        screened_topics: Teme visokog rizika (ključevi HIGH_RISK_SCREENING_QUESTIONS) čije je standardno pitanje postavljeno.
     """
-    messages: Annotated[List[AnyMessage], operator.add]
+    messages: Annotated[List[AnyMessage], add_messages]
     referral_letter: str | None
     patient_name: str | None
     off_topic_counter: int
     last_question: str
     questions_answered: int
     summary_confirmed: bool
-    terminate_reason: str | None
+    terminate_reason: Literal["self_harm_risk", "off_topic_limit", "completed"] | None
     doctor_summary: str | None
     patient_summary: str | None
-    urgency_level: str | None
\ No newline at end of file
+    urgency_level: Literal["routine", "moderate", "high"] | None
+    pending_questions: List[str]
+    next_action: Literal["ask_question", "generate_summary"] | None
+    history_str: str
+    history_len: int
+    rolling_summary: str
+    rolling_summary_len: int
+    epworth_scores: Dict[str, Optional[int]]
+    epworth_pending: str | None
+    screened_topics: List[str]
\ No newline at end of file
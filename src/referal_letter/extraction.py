@@ -1,8 +1,15 @@
+import io
 import os
+import json
 import base64
+import asyncio
+import hashlib
+import functools
+import tempfile
 from typing import List, Optional
+import httpx
 from pydantic import BaseModel, Field
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, convert_from_bytes
 from openai import AsyncOpenAI
 
 
@@ -14,31 +21,170 @@ class ReferralInfo(BaseModel):
     referred_to: str = Field(description="Specialist, department, or hospital referred to.")
 
 
+# Structured output format for ReferralInfo, built once. chat.completions.parse() regenerates the strict
+# JSON schema from the model on every call.
+REFERRAL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ReferralInfo",
+        "strict": True,
+        "schema": {**ReferralInfo.model_json_schema(), "additionalProperties": False},
+    },
+}
+
+
+DOCUMENT_SYSTEM_PROMPT = (
+    "Extract the most important information from this multi-page doctor's referral letter. "
+    "Provide patient name, referring doctor name, referral reason, referral date, and "
+    "specialist or hospital referred to."
+)
+PAGE_SYSTEM_PROMPT = (
+    "This is one page of a doctor's referral letter. Extract the patient name, referring doctor name, "
+    "referral reason, referral date, and specialist or hospital referred to, as far as they appear on this page. "
+    "Use an empty string for anything that is not on this page."
+)
+# System messages are sent unchanged with every request, built once
+DOCUMENT_SYSTEM_MESSAGE = {"role": "system", "content": DOCUMENT_SYSTEM_PROMPT}
+PAGE_SYSTEM_MESSAGE = {"role": "system", "content": PAGE_SYSTEM_PROMPT}
+# Fields that must agree across pages; the referral reason may be spread over several pages
+SINGLE_VALUE_FIELDS = ("patient_name", "doctor_name", "referral_date", "referred_to")
+
+
+def merge_page_results(pages: List[Optional[ReferralInfo]]) -> Optional[ReferralInfo]:
+    """
+    Merge per-page extractions into one result: each single-value field must have exactly one distinct
+    non-empty value, referral reasons are joined in page order.
+    Returns None when the merge is ambiguous (a failed page, a missing field or conflicting values).
+    """
+    if not pages or any(page is None for page in pages):
+        return None
+    merged = {}
+    for field in SINGLE_VALUE_FIELDS:
+        values = {}
+        for page in pages:
+            value = getattr(page, field).strip()
+            if value:
+                values.setdefault(value.casefold(), value)
+        if len(values) != 1:
+            return None
+        merged[field] = next(iter(values.values()))
+    reasons = {}
+    for page in pages:
+        reason = page.referral_reason.strip()
+        if reason:
+            reasons.setdefault(reason.casefold(), reason)
+    if not reasons:
+        return None
+    merged["referral_reason"] = " ".join(reasons.values())
+    return ReferralInfo(**merged)
+
+
+# Rendered pages are deterministic for a given PDF and rendering settings, so they can be reused across runs.
+# Caching is enabled by setting REFERRAL_PAGE_CACHE_DIR (e.g. to this directory) or passing cache_dir.
+DEFAULT_PAGE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sagence", "referral")
+
+
+def _pdf_hash(pdf_path: str) -> str:
+    """SHA-256 of a PDF file, read in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_client(api_key: str) -> AsyncOpenAI:
+    """One OpenAI client per API key, shared by extractors that do not bring their own HTTP client."""
+    http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=50))
+    return AsyncOpenAI(api_key=api_key, http_client=http_client)
+
+
 class AsyncReferralLetterExtractor:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_client: Optional[httpx.AsyncClient] = None,
+                 dpi: int = 200, jpeg_quality: int = 75, grayscale: bool = True,
+                 max_concurrency: Optional[int] = None, cache_dir: Optional[str] = None):
         api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OpenAI API key must be provided or set in the OPENAI_API_KEY environment variable.")
-        self.client = AsyncOpenAI(api_key=api_key)
+        # Extractors without their own HTTP client share one connection pool instead of opening a new one each
+        self._owns_client = http_client is not None
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client) if http_client else _shared_client(api_key)
+        # Referral letters are text: 200 DPI grayscale pages read as well as 300 DPI colour at a fraction of the upload
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.grayscale = grayscale
+        # Bound concurrent GPT-4o requests so batch runs stay under the API rate limit
+        max_concurrency = max_concurrency or int(os.getenv("REFERRAL_EXTRACTION_CONCURRENCY", "8"))
+        self._sem = asyncio.Semaphore(max_concurrency)
+        # Disk cache of rendered base64 pages, keyed by PDF content and rendering settings; None disables it
+        self.cache_dir = cache_dir or os.getenv("REFERRAL_PAGE_CACHE_DIR")
 
-    @staticmethod
-    def convert_pdf_to_images(pdf_path: str) -> List[str]:
-        """Convert PDF pages to JPEG images (sync since pdf2image is not async)."""
-        images = convert_from_path(pdf_path, dpi=300)
-        image_paths = []
-        for i, image in enumerate(images):
-            temp_path = f"{pdf_path}_page_{i + 1}.jpg"
-            image.save(temp_path, "JPEG")
-            image_paths.append(temp_path)
-        return image_paths
+    async def aclose(self):
+        """Close the OpenAI client and its HTTP connection pool; the shared client stays open."""
+        if self._owns_client:
+            await self.client.close()
 
-    @staticmethod
-    def encode_image_to_base64(image_path: str) -> str:
-        """Encode image to base64."""
-        with open(image_path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+    def encode_page_to_base64(self, image) -> str:
+        """Encode one rendered page as a base64 JPEG in memory."""
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=self.jpeg_quality)
+        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+    async def encode_pages_to_base64(self, images) -> List[str]:
+        """Encode rendered pages concurrently in worker threads (PIL releases the GIL while compressing)."""
+        return list(await asyncio.gather(*(asyncio.to_thread(self.encode_page_to_base64, image) for image in images)))
+
+    def _cache_path(self, pdf_hash: str) -> str:
+        """Cache file for a PDF hash and the extractor's rendering settings."""
+        settings = f"{self.dpi}-{self.jpeg_quality}-{'gray' if self.grayscale else 'rgb'}"
+        return os.path.join(self.cache_dir, f"{pdf_hash}-{settings}.json")
+
+    def _load_cached_pages(self, pdf_hash: str) -> Optional[List[str]]:
+        """Cached base64 pages for a PDF, or None on a miss or an unreadable entry."""
+        try:
+            with open(self._cache_path(pdf_hash), encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store_cached_pages(self, pdf_hash: str, pages: List[str]):
+        """Write base64 pages to the cache atomically, so concurrent runs never read a partial file."""
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"pages": pages}, f)
+            os.replace(tmp_path, self._cache_path(pdf_hash))
+            tmp_path = None
+        except OSError as e:
+            print(f"⚠️ Could not write page cache: {e}")
+        finally:
+            # Whatever interrupted the write, no temp file is left in the cache directory
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    async def render_pages(self, render, pdf_hash: Optional[str] = None) -> List[str]:
+        """
+        Render and encode PDF pages, reusing the disk cache when it is enabled.
+        render is a blocking callable returning the page images; it only runs on a cache miss.
+        """
+        if self.cache_dir and pdf_hash:
+            cached = await asyncio.to_thread(self._load_cached_pages, pdf_hash)
+            if cached is not None:
+                return cached
+        images = await asyncio.to_thread(render)
+        base64_images = await self.encode_pages_to_base64(images)
+        if self.cache_dir and pdf_hash:
+            await asyncio.to_thread(self._store_cached_pages, pdf_hash, base64_images)
+        return base64_images
 
-    async def extract_info_from_images(self, base64_images: List[str]) -> Optional[ReferralInfo]:
+    async def extract_info_from_images(self, base64_images: List[str],
+                                       system_message: dict = DOCUMENT_SYSTEM_MESSAGE) -> Optional[ReferralInfo]:
         """Asynchronously extract info from images using GPT-4o."""
         message_content = [
             {
@@ -52,61 +198,93 @@ class AsyncReferralLetterExtractor:
         ]
 
         try:
-            completion = await self.client.chat.completions.parse(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Extract the most important information from this multi-page doctor's referral letter. "
-                            "Provide patient name, referring doctor name, referral reason, referral date, and "
-                            "specialist or hospital referred to."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": message_content,
-                    },
-                ],
-                temperature=0,
-                response_format=ReferralInfo,
-            )
-            return completion.choices[0].message.parsed
+            async with self._sem:
+                completion = await self.client.chat.completions.create(
+                    model="gpt-4o-2024-08-06",
+                    messages=[
+                        system_message,
+                        {
+                            "role": "user",
+                            "content": message_content,
+                        },
+                    ],
+                    temperature=0,
+                    response_format=REFERRAL_RESPONSE_FORMAT,
+                )
+            return ReferralInfo.model_validate_json(completion.choices[0].message.content)
         except Exception as e:
             print(f"❌ GPT extraction failed: {e}")
             return None
 
+    async def _extract_page(self, b64: str) -> Optional[ReferralInfo]:
+        """Extract referral info from a single page."""
+        return await self.extract_info_from_images([b64], PAGE_SYSTEM_MESSAGE)
+
+    async def extract_referral(self, base64_images: List[str]) -> Optional[ReferralInfo]:
+        """
+        Extract referral info from all pages. Pages of a multi-page letter are extracted concurrently and merged
+        on the client, so wall-clock follows the slowest page; when the merge is ambiguous the whole letter is
+        sent in one request as before.
+        """
+        if len(base64_images) > 1:
+            pages = await asyncio.gather(*(self._extract_page(b64) for b64 in base64_images))
+            merged = merge_page_results(pages)
+            if merged:
+                return merged
+        return await self.extract_info_from_images(base64_images)
+
+    @staticmethod
+    def error_result(filename: str) -> dict:
+        """Result returned when a PDF could not be processed."""
+        return {
+            "filename": filename,
+            "patient_name": "ERROR",
+            "doctor_name": "ERROR",
+            "referral_reason": "ERROR",
+            "referral_date": "ERROR",
+            "referred_to": "ERROR",
+        }
+
+    async def extract_result(self, filename: str, base64_images: List[str]) -> dict:
+        """Extract referral info from page images and build the result for one PDF."""
+        print(f"📄 Processing: {filename} ({len(base64_images)} pages)...")
+
+        result = await self.extract_referral(base64_images)
+        if result:
+            return {
+                "filename": filename,
+                **result.model_dump()
+            }
+        return self.error_result(filename)
+
     async def process_pdf(self, pdf_path: str) -> dict:
         """Process a single PDF file asynchronously."""
         try:
-            image_paths = self.convert_pdf_to_images(pdf_path)
-            base64_images = [self.encode_image_to_base64(p) for p in image_paths]
+            # Rasterizing and encoding pages is blocking work; keep it off the event loop.
+            # Pages are encoded in memory, no page images are written next to the PDF.
+            pdf_hash = await asyncio.to_thread(_pdf_hash, pdf_path) if self.cache_dir else None
+            base64_images = await self.render_pages(
+                lambda: convert_from_path(pdf_path, dpi=self.dpi, grayscale=self.grayscale), pdf_hash
+            )
+            return await self.extract_result(os.path.basename(pdf_path), base64_images)
 
-            print(f"📄 Processing: {os.path.basename(pdf_path)} ({len(base64_images)} pages)...")
+        except Exception as e:
+            print(f"❌ Error processing {pdf_path}: {e}")
+            return self.error_result(os.path.basename(pdf_path))
 
-            result = await self.extract_info_from_images(base64_images)
-            if result:
-                return {
-                    "filename": os.path.basename(pdf_path),
-                    **result.dict()
-                }
-            else:
-                return {
-                    "filename": os.path.basename(pdf_path),
-                    "patient_name": "ERROR",
-                    "doctor_name": "ERROR",
-                    "referral_reason": "ERROR",
-                    "referral_date": "ERROR",
-                    "referred_to": "ERROR",
-                }
+    async def process_pdf_bytes(self, pdf_bytes: bytes, filename: str = "upload.pdf") -> dict:
+        """Process an in-memory PDF asynchronously, without writing page images to disk."""
+        try:
+            pdf_hash = hashlib.sha256(pdf_bytes).hexdigest() if self.cache_dir else None
+            base64_images = await self.render_pages(
+                lambda: convert_from_bytes(pdf_bytes, dpi=self.dpi, grayscale=self.grayscale), pdf_hash
+            )
+            return await self.extract_result(filename, base64_images)
 
         except Exception as e:
-            print(f"❌ Error processing {pdf_path}: {e}")
-            return {
-                "filename": os.path.basename(pdf_path),
-                "patient_name": "ERROR",
-                "doctor_name": "ERROR",
-                "referral_reason": "ERROR",
-                "referral_date": "ERROR",
-                "referred_to": "ERROR",
-            }
\ No newline at end of file
+            print(f"❌ Error processing {filename}: {e}")
+            return self.error_result(filename)
+
+    async def process_many(self, pdf_paths: List[str]) -> List[dict]:
+        """Process several PDF files concurrently; GPT-4o requests are bounded by the extractor's semaphore."""
+        return list(await asyncio.gather(*(self.process_pdf(p) for p in pdf_paths)))
@@ -6,41 +6,69 @@ Run this script to test all API endpoints.
 
 import sys
 import os
-import subprocess
+import re
+import asyncio
+import shutil
 import time
+import importlib.util
 
 # Add the parent directory to the path so we can import modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def check_api_server():
+async def check_api_server():
     """Check if the API server is running."""
-    import requests
+    import httpx
     try:
-        response = requests.get("http://localhost:8010/api/health", timeout=5)
+        # A healthy local server answers in milliseconds
+        async with httpx.AsyncClient() as client:
+            response = await client.get("http://localhost:8010/api/health", timeout=2.0)
         return response.status_code == 200
-    except:
+    except httpx.HTTPError:
         return False
 
-def install_test_dependencies():
-    """Install test dependencies."""
-    print("📦 Installing test dependencies...")
-    try:
-        subprocess.run([
-            sys.executable, "-m", "pip", "install", "-r", "test/requirements_test.txt"
-        ], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        print("✅ Test dependencies installed successfully")
+def missing_test_dependencies():
+    """Requirements from test/requirements_test.txt whose package cannot be imported."""
+    requirements_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements_test.txt")
+    missing = []
+    with open(requirements_path) as f:
+        for line in f:
+            requirement = line.split("#", 1)[0].strip()
+            if not requirement:
+                continue
+            package = re.split(r"[\s\[<>=!~;]", requirement, maxsplit=1)[0]
+            if importlib.util.find_spec(package.lower().replace("-", "_")) is None:
+                missing.append(requirement)
+    return missing
+
+async def install_test_dependencies():
+    """Install test dependencies that are not installed yet."""
+    missing = missing_test_dependencies()
+    if not missing:
+        print("✅ Test dependencies already installed")
         return True
-    except subprocess.CalledProcessError:
+    print(f"📦 Installing test dependencies: {', '.join(missing)}...")
+    # uv resolves and installs much faster than pip when it is available
+    if shutil.which("uv"):
+        command = ["uv", "pip", "install", "--python", sys.executable, *missing]
+    else:
+        command = [sys.executable, "-m", "pip", "install", *missing]
+    process = await asyncio.create_subprocess_exec(
+        *command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if await process.wait() != 0:
         print("❌ Failed to install test dependencies")
         return False
+    print("✅ Test dependencies installed successfully")
+    return True
 
-def main():
+async def main():
     """Main function to run tests."""
     print("🧪 API Endpoint Test Runner")
     print("="*50)
     
-    # Check if API server is running
-    if not check_api_server():
+    # Check if API server is running while dependencies are installed, the two are independent
+    server_running, dependencies_installed = await asyncio.gather(check_api_server(), install_test_dependencies())
+    if not server_running:
         print("❌ API server is not running on http://localhost:8010")
         print("Please start the API server first:")
         print("  python3 -m app.main")
@@ -50,8 +78,7 @@ def main():
     
     print("✅ API server is running")
     
-    # Install dependencies if needed
-    if not install_test_dependencies():
+    if not dependencies_installed:
         return 1
     
     # Run the tests
@@ -72,5 +99,5 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    exit_code = main()
+    exit_code = asyncio.run(main())
     sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Compares the guardrail and self-harm classifications of two models on saved conversations.
+Used to check that the smaller classifier model agrees with gpt-4o before switching to it.
+"""
+
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any
+
+# Add the src directory to the path to import the graph
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from langchain_openai import ChatOpenAI
+from bot.graph import MESSAGE_SAFETY_PROMPT, CLASSIFIER_MODEL
+from bot.models import MessageSafetyDecision
+
+ROLE_BY_SENDER = {"doctor": "ai", "patient": "human"}
+
+def load_patient_turns(db_path: str, limit: int) -> List[Dict[str, Any]]:
+    """Load patient messages with the context the message safety check would see."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('''
+        SELECT conversation_id, sender, message_content
+        FROM messages
+        ORDER BY conversation_id, message_order
+    ''').fetchall()
+    conn.close()
+
+    turns = []
+    history: List[tuple] = []
+    current_conversation = None
+    for conversation_id, sender, content in rows:
+        if conversation_id != current_conversation:
+            current_conversation, history = conversation_id, []
+        history.append((ROLE_BY_SENDER.get(sender, sender), content))
+        if sender != "patient":
+            continue
+        last_question = next((c for role, c in reversed(history[:-1]) if role == "ai"), "")
+        recent = history[-5:]
+        turns.append({
+            "conversation_id": conversation_id,
+            "user_message": content,
+            "last_question": last_question,
+            "conversation_history": "\n".join(f"{role}: {c}" for role, c in recent),
+        })
+        if len(turns) >= limit:
+            break
+    return turns
+
+def classify(model: str, turns: List[Dict[str, Any]]) -> List[tuple]:
+    """Run the combined topic and self-harm classifier of the given model over the turns."""
+    llm = ChatOpenAI(model=model, temperature=0)
+    message_safety = MESSAGE_SAFETY_PROMPT | llm.with_structured_output(MessageSafetyDecision)
+
+    results = message_safety.batch([
+        {k: t[k] for k in ("user_message", "last_question", "conversation_history")} for t in turns
+    ])
+    return [
+        (r.topic.is_on_topic, r.risk.risk_detected and r.risk.risk_level in ["medium", "high", "immediate"])
+        for r in results
+    ]
+
+def main():
+    """Main function for classifier comparison."""
+    parser = argparse.ArgumentParser(description="Compare classifier models on saved conversations")
+    parser.add_argument("--db", "-d", type=str, default="test/test_agent/conversation_results.db",
+                       help="Path to conversation results database")
+    parser.add_argument("--baseline", type=str, default="gpt-4o", help="Reference model")
+    parser.add_argument("--candidate", type=str, default=CLASSIFIER_MODEL, help="Model to evaluate")
+    parser.add_argument("--limit", "-n", type=int, default=200, help="Maximum number of patient messages")
+
+    args = parser.parse_args()
+
+    turns = load_patient_turns(args.db, args.limit)
+    if not turns:
+        print(f"❌ No patient messages found in {args.db}")
+        sys.exit(1)
+
+    print(f"Classifying {len(turns)} patient messages with {args.baseline} and {args.candidate}...")
+    baseline = classify(args.baseline, turns)
+    candidate = classify(args.candidate, turns)
+
+    for index, name in enumerate(["Guardrail (on-topic)", "Suicide check (terminate)"]):
+        disagreements = [(t, b[index], c[index]) for t, b, c in zip(turns, baseline, candidate) if b[index] != c[index]]
+        agreement = 1 - len(disagreements) / len(turns)
+        print(f"\n{name}: {agreement:.1%} agreement ({len(disagreements)} disagreements)")
+        for turn, expected, got in disagreements:
+            print(f"  [{turn['conversation_id']}] {args.baseline}={expected} {args.candidate}={got}: {turn['user_message'][:100]}")
+
+if __name__ == "__main__":
+    main()
@@ -184,7 +184,7 @@ IMPORTANT: Only provide information when specifically asked. Don't give long spe
         # Create the conversation prompt
         prompt = ChatPromptTemplate.from_messages([
             ("system", self.get_system_prompt()),
-            ("human", f"Doctor says: {doctor_message}\n\nRespond as the patient:")
+            ("human", "Doctor says: {doctor_message}\n\nRespond as the patient:")
         ])
         
         chain = prompt | self.llm
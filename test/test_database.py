@@ -0,0 +1,76 @@
+"""
+Unit tests for the database layer that need no running API server.
+Run with: python -m pytest test/test_database.py
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, event, insert, select
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """app.database imported inside a temporary directory, so its SQLite file is not created in the repo."""
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("app.database")
+
+
+@pytest.mark.parametrize("has_jsonb", [False, True])
+def test_jsonb_round_trip(database, monkeypatch, has_jsonb):
+    """Values written through JSONB load back as dicts, with and without SQLite's binary JSONB."""
+    monkeypatch.setattr(database, "SQLITE_HAS_JSONB", has_jsonb)
+    engine = create_engine("sqlite://")
+
+    if has_jsonb:
+        @event.listens_for(engine, "connect")
+        def add_jsonb(dbapi_connection, connection_record):
+            # SQLite older than 3.45 has no jsonb(); an identity function keeps the json(jsonb(...)) path testable
+            try:
+                dbapi_connection.execute("SELECT jsonb('{}')")
+            except Exception:
+                dbapi_connection.create_function("jsonb", 1, lambda value: value, deterministic=True)
+
+    metadata = MetaData()
+    table = Table("docs", metadata, Column("id", Integer, primary_key=True), Column("data", database.JSONB))
+    metadata.create_all(engine)
+    value = {"a": 1, "nested": {"b": [1, 2]}}
+
+    with engine.begin() as conn:
+        conn.execute(insert(table).values(id=1, data=value))
+        loaded = conn.execute(select(table.c.data)).scalar_one()
+
+    assert isinstance(loaded, dict)
+    assert loaded == value
+
+
+@pytest.fixture
+def db_manager(database, monkeypatch):
+    """A DatabaseManager on a fresh in-memory database."""
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine, expire_on_commit=False))
+    return database.DatabaseManager()
+
+
+def test_search_total_count_past_last_page(db_manager):
+    """total_count is the number of matches even when the requested page is empty."""
+    for i in range(3):
+        db_manager.create_consultation(f"token-{i}", f"session-{i}", f"Patient {i}")
+
+    page, total = db_manager.search_consultations(limit=2, offset=0)
+    assert (len(page), total) == (2, 3)
+    page, total = db_manager.search_consultations(limit=2, offset=2)
+    assert (len(page), total) == (1, 3)
+    page, total = db_manager.search_consultations(limit=2, offset=10)
+    assert (len(page), total) == (0, 3)
+    page, total = db_manager.search_consultations(patient_id=999, limit=2, offset=0)
+    assert (len(page), total) == (0, 0)
@@ -0,0 +1,115 @@
+"""
+Unit tests for the Epworth Sleepiness Scale parsing, scoring and the repeat-then-skip flow.
+Run with: python -m pytest test/test_epworth.py
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bot.epworth import (
+    epworth_complete,
+    epworth_question,
+    epworth_report,
+    epworth_total,
+    next_epworth_situation,
+    parse_epworth_answer,
+)
+from src.bot.helper import EPWORTH_SITUATIONS
+
+
+class TestParseEpworthAnswer:
+    """Scores read from the patient's answer."""
+
+    @pytest.mark.parametrize("answer, expected", [
+        ("2", 2),
+        ("I'd say 3", 3),
+        ("0 - never", 0),
+        ("I would never doze", 0),
+        ("slight chance", 1),
+        ("Moderate chance I think", 2),
+        ("high chance", 3),
+        ("No chance at all", 0),
+        ("no chance", 0),
+    ])
+    def test_valid_scores(self, answer, expected):
+        assert parse_epworth_answer(answer) == expected
+
+    @pytest.mark.parametrize("answer", [
+        "I don't drive", "0.5", "1.5", "5", "not sure", "",
+        "no one would notice, I am fine", "not high at all", "I never drive", "Never",
+    ])
+    def test_no_valid_score(self, answer):
+        assert parse_epworth_answer(answer) is None
+
+
+class TestEpworthScoring:
+    """Completion, totals and the report for the summary prompts."""
+
+    def test_unscored_items_count_as_done(self):
+        scores = {situation: 1 for situation in EPWORTH_SITUATIONS[:-1]}
+        assert not epworth_complete(scores)
+        scores[EPWORTH_SITUATIONS[-1]] = None
+        assert epworth_complete(scores)
+        assert next_epworth_situation(scores) is None
+        assert epworth_total(scores) == len(EPWORTH_SITUATIONS) - 1
+
+    def test_report_flags_unscored_items(self):
+        scores = {situation: 2 for situation in EPWORTH_SITUATIONS}
+        scores[EPWORTH_SITUATIONS[0]] = None
+        report = epworth_report(scores)
+        assert f"- {EPWORTH_SITUATIONS[0]}: not scored" in report
+        assert "Partial ESS score: 14/24 from 7 of 8 situations (1 not scored)" in report
+        assert "Total ESS score" not in report
+
+    def test_report_complete_scale(self):
+        scores = {situation: 1 for situation in EPWORTH_SITUATIONS}
+        assert "Total ESS score: 8/24 (mild)" in epworth_report(scores)
+
+
+class TestEpworthRepeatThenSkip:
+    """An item without a 0-3 answer is asked once more, then left unscored so the scale completes."""
+
+    @pytest.fixture
+    def graph(self):
+        pytest.importorskip("langgraph")
+        from src.bot import graph
+        return graph
+
+    def test_repeat_then_skip(self, graph):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        situation = EPWORTH_SITUATIONS[0]
+        state = {
+            "messages": [AIMessage(content="How long have you had trouble sleeping?"), HumanMessage(content="Years")],
+            "last_question": "How long have you had trouble sleeping?",
+            "questions_answered": 1,
+            "epworth_scores": {},
+            "epworth_pending": None,
+        }
+
+        def ask(state):
+            update = graph.ask_question_node(state)
+            return {**state, **update, "messages": state["messages"] + update["messages"]}
+
+        def answer(state, text):
+            state = {**state, "messages": state["messages"] + [HumanMessage(content=text)]}
+            return {**state, **graph.record_epworth_answer(state)}
+
+        state = ask(state)
+        assert state["last_question"] == epworth_question(situation)
+
+        state = answer(state, "I don't drive")
+        assert situation not in state["epworth_scores"]
+        state = ask(state)
+        assert state["last_question"] == epworth_question(situation, repeat=True)
+
+        state = answer(state, "Really can't say")
+        assert state["epworth_scores"][situation] is None
+        assert state["epworth_pending"] is None
+        state = ask(state)
+        assert state["last_question"] == epworth_question(EPWORTH_SITUATIONS[1])
@@ -0,0 +1,37 @@
+"""
+Unit tests for the referral letter extractor that need no OpenAI calls or poppler.
+Run with: python -m pytest test/test_extraction.py
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("pdf2image")
+
+from src.referal_letter.extraction import AsyncReferralLetterExtractor
+
+
+@pytest.fixture
+def extractor(tmp_path):
+    return AsyncReferralLetterExtractor(api_key="test-key", cache_dir=str(tmp_path))
+
+
+def test_page_cache_round_trip(extractor, tmp_path):
+    extractor._store_cached_pages("abc", ["page1", "page2"])
+
+    assert extractor._load_cached_pages("abc") == ["page1", "page2"]
+    assert extractor._load_cached_pages("missing") is None
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_failed_cache_write_leaves_no_temp_file(extractor, tmp_path):
+    with pytest.raises(TypeError):
+        extractor._store_cached_pages("abc", [object()])
+
+    assert not list(tmp_path.glob("*.tmp"))
+    assert extractor._load_cached_pages("abc") is None
@@ -0,0 +1,71 @@
+"""
+Unit tests for graph nodes, with the LLM replaced by canned responses.
+Run with: python -m pytest test/test_graph.py
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("langgraph")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.bot import graph
+from src.bot.helper import get_personalized_greeting_message
+from src.bot.models import QuestionBatch
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Replace the question LLMs with canned responses and record which of them were called."""
+    calls = []
+
+    def structured_llm(schema, cache_key=None):
+        calls.append("batch")
+        return RunnableLambda(lambda _: QuestionBatch(questions=[f"Question {i}" for i in range(1, 6)]))
+
+    def llm(cache_key=None):
+        calls.append("single")
+        return RunnableLambda(lambda _: AIMessage(content="Single question"))
+
+    monkeypatch.setattr(graph, "get_structured_llm", structured_llm)
+    monkeypatch.setattr(graph, "get_llm", llm)
+    return calls
+
+
+def api_first_turn_state():
+    """State on the first /chat turn: API greeting, the patient's reply, and the reply counted by pre_check."""
+    return {
+        "messages": [AIMessage(content=get_personalized_greeting_message("John Smith")),
+                     HumanMessage(content="I wake up several times every night.")],
+        "referral_letter": "Patient Name: John Smith",
+        "patient_name": "John Smith",
+        "off_topic_counter": 0,
+        "last_question": "",
+        "questions_answered": 1,
+        "summary_confirmed": False,
+    }
+
+
+def test_first_question_prepares_batch_after_api_greeting(llm_calls):
+    update = graph.ask_question_node(api_first_turn_state())
+
+    assert "batch" in llm_calls
+    assert update["messages"][-1].content == "Question 1"
+    assert update["pending_questions"] == ["Question 2", "Question 3", "Question 4", "Question 5"]
+
+
+def test_prepared_question_is_used_without_llm_call(llm_calls):
+    state = {**api_first_turn_state(), "last_question": "Question 1", "questions_answered": 2,
+             "pending_questions": ["Question 2", "Question 3"]}
+    update = graph.ask_question_node(state)
+
+    assert llm_calls == []
+    assert update["messages"][-1].content == "Question 2"
+    assert update["pending_questions"] == ["Question 3"]
@@ -0,0 +1,62 @@
+"""
+Unit tests for prompt helpers that need no LLM or running API server.
+Run with: python -m pytest test/test_helper.py
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bot.helper import extract_patient_name, is_clearly_on_topic
+
+
+@pytest.mark.parametrize("letter, expected", [
+    ("Patient Name: John Smith\nDOB: 01/02/1980", "John Smith"),
+    ("PATIENT NAME:  Mary O'Neil", "Mary O'Neil"),
+    ("Patient: Jane Doe", "Jane Doe"),
+    ("Re: Ahmed Khan, referral for sleep study", "Ahmed Khan"),
+    ("Dear Dr Brown,\nRegarding:\nPeter Parker", "Peter Parker"),
+])
+def test_extract_patient_name(letter, expected):
+    assert extract_patient_name(letter) == expected
+
+
+@pytest.mark.parametrize("letter", [
+    "we are Concerned about John Smith",
+    "His surname Smith",
+    "Where Is this",
+    "The patient Tom has insomnia",
+    "Patient name: john smith",
+    "",
+    None,
+])
+def test_extract_patient_name_without_labelled_name(letter):
+    assert extract_patient_name(letter) is None
+
+
+@pytest.mark.parametrize("message", [
+    "yes",
+    "8 hours",
+    "No, maybe twice a week after work",
+    "About 3 cups a day, sometimes 4 on weekends",
+    "Usually around 11pm, sometimes later than that",
+    "Yes, about twice a week, usually on weekdays",
+    "I keep waking up at 3am and can't get back to sleep",
+])
+def test_clearly_on_topic(message):
+    assert is_clearly_on_topic(message)
+
+
+@pytest.mark.parametrize("message", [
+    "No. Who will win the election tonight?",
+    "Yes, and what is the weather in Paris",
+    "twice a day i watch football highlights, who won",
+    "Maybe you can tell me a good recipe for pasta",
+    "Sometimes I think about buying a new car soon",
+])
+def test_answer_shaped_prefix_is_not_clearly_on_topic(message):
+    assert not is_clearly_on_topic(message)
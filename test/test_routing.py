@@ -0,0 +1,45 @@
+"""
+Unit tests for the deterministic routing gates.
+Run with: python -m pytest test/test_routing.py
+"""
+
+import os
+import sys
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bot.helper import EPWORTH_SITUATIONS, HIGH_RISK_SCREENING_QUESTIONS
+from src.bot.routing import deterministic_route, next_unscreened_topic
+
+TOPICS = list(HIGH_RISK_SCREENING_QUESTIONS)
+
+
+def ready_state(**values):
+    """State that passes every gate, overridden by values."""
+    state = {
+        "messages": [],
+        "questions_answered": 10,
+        "epworth_scores": {situation: 1 for situation in EPWORTH_SITUATIONS},
+        "screened_topics": TOPICS,
+    }
+    state.update(values)
+    return state
+
+
+def test_next_unscreened_topic_follows_recorded_topics():
+    assert next_unscreened_topic([]) == TOPICS[0]
+    assert next_unscreened_topic(TOPICS[:2]) == TOPICS[2]
+    assert next_unscreened_topic(TOPICS) is None
+
+
+def test_route_waits_for_recorded_screening():
+    assert deterministic_route(ready_state()) is None
+    assert deterministic_route(ready_state(screened_topics=TOPICS[:-1])) == "ask_question"
+    assert deterministic_route(ready_state(screened_topics=[])) == "ask_question"
+
+
+def test_route_other_gates():
+    assert deterministic_route(ready_state(summary_confirmed=True, questions_answered=0)) == "generate_summary"
+    assert deterministic_route(ready_state(questions_answered=4)) == "ask_question"
+    assert deterministic_route(ready_state(epworth_scores={})) == "ask_question"
@@ -0,0 +1,40 @@
+"""
+Unit tests for session serialization used by the Redis session store.
+Run with: python -m pytest test/test_sessions.py
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.sessions import dumps_session, loads_session
+
+
+def test_session_json_round_trip():
+    session = {
+        "state": {
+            "messages": [AIMessage(content="Hello John!"), HumanMessage(content="I can't sleep.")],
+            "patient_name": "John Smith",
+            "questions_answered": 1,
+            "epworth_scores": {"Watching TV": 2, "Sitting and reading": None},
+            "screened_topics": ["driving"],
+            "terminate_reason": None,
+        },
+        "config": {"recursion_limit": 150, "configurable": {"thread_id": "session-1"}},
+        "consultation_id": 7,
+    }
+
+    raw = dumps_session(session)
+    assert isinstance(raw, str)
+    restored = loads_session(raw)
+
+    assert restored == session
+    assert [type(msg) for msg in restored["state"]["messages"]] == [AIMessage, HumanMessage]